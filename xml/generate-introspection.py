@@ -1,6 +1,31 @@
-import xml.etree.ElementTree as ET
-tree = ET.parse("../xml/Event.xml")
-root = tree.getroot()
+import io
+import sys
+
+try:
+  # libxml2-backed parsing when available; comments are dropped so that iterating
+  # an element yields the same children as the stdlib parser.
+  from lxml import etree as ET
+  def iterparse(filename):
+    return ET.iterparse(filename, events=("end",), tag="interface",
+                        remove_comments=True, collect_ids=False)
+  def release(element):
+    element.clear()
+    while element.getprevious() is not None:
+      del element.getparent()[0]
+except ImportError:
+  import xml.etree.ElementTree as ET
+  def iterparse(filename):
+    return ET.iterparse(filename, events=("end",))
+  def release(element):
+    element.clear()
+
+def iter_interfaces(filename):
+  """Stream the <interface> elements of an event file, freeing each one after use."""
+  for _, interface in iterparse(filename):
+    if interface.tag != "interface":
+      continue
+    yield interface
+    release(interface)
 
 RUST_TYPE_FROM_DBUS_TYPE = {
   "s": "String",
@@ -10,91 +35,117 @@ RUST_TYPE_FROM_DBUS_TYPE = {
   "a{sv}": "&std::collections::HashMap<String, zvariant::OwnedValue>",
   "o": "OwnedPath"
 }
-ARG_IDENT_FROM_NUMBER = [
+ARG_IDENT_FROM_NUMBER = (
   "kind",
   "detail1",
   "detail2",
   "any_data",
   "properties"
-]
+)
+
+# stands in for arguments without a name; shared and never modified
+UNUSED_ARG = {"name": None, "type": None}
 
-# will store lists of members with their various details. Will output a markdown table.
-interfaces = []
+# fixed parts of each event struct declaration; only the variant name changes
+STRUCT_HEADER = "//#[derive(Debug, Clone)]\npub struct "
+STRUCT_TAIL = "Event(crate::events::AtspiEvent);"
 
-def print_interface_table(signals):
-  print(f"/// Event table for the contained types:\n///")
-  print(f"/// Interface|Member|Kind|Detail 1|Detail 2|Any Data|Properties")
-  print(f"/// |:--|---|---|---|---|---|---|")
-  for signal in signals:
-    interface = signal["interface"].replace("Event", "")
-    member = signal["member"]
-    kind = signal["kind"]["name"] or "    "
-    detail1 = signal["detail1"]["name"] or "    "
-    detail2 = signal["detail2"]["name"] or "    "
-    data = signal["any_data"]["name"] or "    "
-    properties = signal["properties"]["name"]
-    print(f"/// |{interface}|{member}|{kind}|{detail1}|{detail2}|{data}|{properties}|")
+TABLE_HEADER = (
+  "/// Event table for the contained types:\n"
+  "///\n"
+  "/// Interface|Member|Kind|Detail 1|Detail 2|Any Data|Properties\n"
+  "/// |:--|---|---|---|---|---|---|\n"
+)
+TABLE_ROW = "/// |{}|{}|{}|{}|{}|{}|{}|\n"
 
-def impl_functions(signal):
-  iface = signal["interface"].replace("Event", "")
+def print_interface_table(out, interface, columns):
+  out.write(TABLE_HEADER)
+  out.writelines(TABLE_ROW.format(interface, *row) for row in zip(*columns))
+
+def impl_functions(out, signal):
   impl_member = signal["member"]
-  print(f"impl {impl_member}Event {{")
-  for (zbus_name, struct_name) in signal.items():
-    if zbus_name in ARG_IDENT_FROM_NUMBER and struct_name["name"]:
+  out.write(f"impl {impl_member}Event {{\n")
+  for zbus_name in ARG_IDENT_FROM_NUMBER:
+    struct_name = signal.get(zbus_name)
+    if struct_name and struct_name["name"]:
       rust_type = RUST_TYPE_FROM_DBUS_TYPE[struct_name["type"]]
-      print(f"\t#[must_use]")
-      print(f"\tpub fn {struct_name['name']}(&self) -> {rust_type} {{")
+      out.write(f"\t#[must_use]\n")
+      out.write(f"\tpub fn {struct_name['name']}(&self) -> {rust_type} {{\n")
       if rust_type == "String":
-        print(f"\t\tself.0.{zbus_name}().to_string()")
+        out.write(f"\t\tself.0.{zbus_name}().to_string()\n")
       else:
-        print(f"\t\tself.0.{zbus_name}()")
-      print(f"}}")
-  print(f"}}")
+        out.write(f"\t\tself.0.{zbus_name}()\n")
+      out.write(f"}}\n")
+  out.write(f"}}\n")
 
-for interface in root:
-  interface_name = interface.attrib["name"].split(".")[-1]
+def write_module(out, interface):
+  """Write the Rust module for one event <interface>."""
+  interface_name = interface.attrib["name"].rsplit(".", 1)[-1]
   enum_name = interface_name + "Event"
-  print(f"pub mod {interface_name.lower()} {{")
-  print("use zbus::zvariant;")
+  out.write(f"pub mod {interface_name.lower()} {{\n")
+  out.write("use zbus::zvariant;\n")
 
-  enum = f"pub enum {enum_name}s {{\n"
+  enum = [f"pub enum {enum_name}s {{\n"]
 # will contain all the attributes to use for markdown table
 
   signals = []
   structs = []
+  # markdown table columns, filled in signal order
+  table_members = []
+  table_kinds = []
+  table_details1 = []
+  table_details2 = []
+  table_data = []
+  table_properties = []
+  table_interface = enum_name.replace("Event", "")
   for signal in interface:
     signal_identities = dict()
     variant_name = signal.attrib["name"]
     signal_identities["interface"] = enum_name
     signal_identities["member"] = variant_name
-    enum += f"\t{variant_name}({variant_name}Event),\n"
-    struct = f"//#[derive(Debug, Clone)]\n"
-    struct += f"pub struct {variant_name}Event(crate::events::AtspiEvent);"
+    enum.append(f"\t{variant_name}({variant_name}Event),\n")
+    struct_buf = [STRUCT_HEADER, variant_name, STRUCT_TAIL]
     for (argi, arg) in enumerate(signal):
 # ignore <annotation> tags for QSPI
       if arg.tag != "arg":
         continue
-      signal_identities[ARG_IDENT_FROM_NUMBER[argi]] = {"name":None,"type":None}
+      attrib = arg.attrib
+      key = ARG_IDENT_FROM_NUMBER[argi]
 # skip getting additional info if the name of the arg is not specified (trhis means it is not used)
-      if "name" not in arg.attrib:
+      if "name" not in attrib:
+        signal_identities[key] = UNUSED_ARG
         continue
-      field_name = arg.attrib["name"]
-      field_type = arg.attrib["type"]
-      rust_type = RUST_TYPE_FROM_DBUS_TYPE[field_type]
-      signal_identities[ARG_IDENT_FROM_NUMBER[argi]] = arg.attrib
+      signal_identities[key] = attrib
       # do not put struct items, use methods instead
-			#struct += f"\t{field_name}: {rust_type},\n"
+			#struct_buf.append(f"\t{attrib['name']}: {RUST_TYPE_FROM_DBUS_TYPE[attrib['type']]},\n")
     signals.append(signal_identities)
-    #struct += "}"
-    structs.append(struct)
-  enum += "}"
-  interfaces.append(signals)
+    table_members.append(variant_name)
+    table_kinds.append(signal_identities["kind"]["name"] or "    ")
+    table_details1.append(signal_identities["detail1"]["name"] or "    ")
+    table_details2.append(signal_identities["detail2"]["name"] or "    ")
+    table_data.append(signal_identities["any_data"]["name"] or "    ")
+    table_properties.append(signal_identities["properties"]["name"])
+    #struct_buf.append("}")
+    structs.append(struct_buf)
+  enum.append("}")
   for (struct, signal) in zip(structs, signals):
-    print(struct)
-    impl_functions(signal)
-  print_interface_table(signals)
-  print(enum)
+    out.writelines(struct)
+    out.write("\n")
+    impl_functions(out, signal)
+  columns = (table_members, table_kinds, table_details1,
+             table_details2, table_data, table_properties)
+  print_interface_table(out, table_interface, columns)
+  out.writelines(enum)
+  out.write("\n")
 # close the module
-  print("}")
+  out.write("}\n")
+
+# the event description can be passed as the only argument; defaults to the repository copy
+event_xml = sys.argv[1] if len(sys.argv) > 1 else "../xml/Event.xml"
 
+# the generated module is buffered here and written to stdout in one go
+module_buf = io.StringIO()
+for interface in iter_interfaces(event_xml):
+  write_module(module_buf, interface)
 
+sys.stdout.write(module_buf.getvalue())